@@ -0,0 +1,134 @@
+"""
+Helpers shared by describe_gifs.py and describe_sources.py.
+
+Importing this module also configures Pillow for frame extraction, so the
+settings apply in both scripts and in their worker processes.
+"""
+
+import argparse
+import functools
+import io
+import queue
+import time
+import warnings
+
+import orjson
+from PIL import Image
+from google.genai import types
+
+# Fields requested for each GIF, shared by the single and batched prompts
+DESCRIPTION_FIELDS = """- "literal": Factual description of the complete action/sequence (1-3 sentences, describe what happens from start to finish)
+- "source": Your best guess at where this is from — movie title, TV show, meme name, video game, news event, YouTube/TikTok trend, etc. Be specific (e.g., "Spy Kids (2001)" not just "movie"). Use "unknown" only if you genuinely cannot identify it.
+- "mood": Emotional tone or vibe (e.g., "funny", "wholesome", "chaotic", "satisfying")
+- "action": Key actions/verbs (e.g., "dancing", "falling", "celebrating")
+- "context": When someone might use this GIF in conversation (e.g., "reaction to good news")
+- "tags": Array of 5-10 searchable keywords (include character names, show titles, meme names if recognized)"""
+
+# Prompt for generating multiple description types
+DESCRIPTION_PROMPT = f"""You are analyzing multiple frames extracted from an animated GIF. The frames are shown in chronological order.
+
+Analyze the FULL sequence of action across all frames and return a JSON object:
+{DESCRIPTION_FIELDS}
+
+Respond with ONLY the JSON object, no markdown or extra text."""
+
+# Built once and shared by every request; the SDK only reads Parts
+PROMPT_PART = types.Part.from_text(text=DESCRIPTION_PROMPT)
+
+# Decompression-bomb guard: refuse frames over 50 MP (Pillow only warns between
+# MAX_IMAGE_PIXELS and 2x that, so promote the warning to an error).
+# Pillow's wheels already bundle libjpeg-turbo for the JPEG frame encoding.
+Image.MAX_IMAGE_PIXELS = 50_000_000
+warnings.simplefilter("error", Image.DecompressionBombWarning)
+
+# Resampling filter for shrinking frames; the VLM downsamples again anyway, so
+# LANCZOS sharpness is wasted (Image.Resampling was added in Pillow 9.1)
+RESAMPLE = getattr(Image, "Resampling", Image).BILINEAR
+
+# Transparent frames below this entropy (bits) are kept as PNG instead of JPEG
+LINE_ART_ENTROPY = 4.0
+
+
+def encode_frame(frame: Image.Image) -> tuple[bytes, str]:
+    """Encode a frame for Gemini. Returns (data, mime_type).
+
+    Frames are sent as JPEG, which is cheaper to encode and several times
+    smaller than PNG. RGBA frames that look like flat line art (low entropy)
+    stay PNG so their transparency and hard edges survive.
+    """
+    buf = io.BytesIO()
+    if frame.mode == "RGBA" and frame.entropy() < LINE_ART_ENTROPY:
+        frame.save(buf, format="PNG")
+        return buf.getvalue(), "image/png"
+    frame.convert("RGB").save(buf, format="JPEG", quality=85, optimize=False, progressive=False)
+    return buf.getvalue(), "image/jpeg"
+
+
+@functools.lru_cache(maxsize=1024)
+def frame_indices(n_frames: int, num_frames: int) -> tuple[int, ...]:
+    """Evenly spaced frame indices including first and last, memoized by frame count."""
+    if n_frames <= num_frames:
+        return tuple(range(n_frames))
+    return tuple(round(i * (n_frames - 1) / (num_frames - 1)) for i in range(num_frames))
+
+
+# Output writer: flush every WRITER_FLUSH_EVERY records or WRITER_FLUSH_SECS,
+# whichever comes first
+WRITER_FLUSH_EVERY = 32
+WRITER_FLUSH_SECS = 1.0
+
+# Sentinel that tells the writer thread to finish
+WRITER_STOP = object()
+
+
+def write_jsonl(q: queue.Queue, out, errors: list) -> None:
+    """Write queued records to an open JSONL file until WRITER_STOP is received.
+
+    Runs on a thread as the only writer of the file, so producers never take
+    a lock and small writes are consolidated into periodic flushes. A write
+    error is appended to `errors` and later records are discarded, so
+    producers never block on a dead writer; callers check it with
+    check_writer().
+    """
+    pending = 0
+    last_flush = time.monotonic()
+    while True:
+        try:
+            record = q.get(timeout=WRITER_FLUSH_SECS)
+        except queue.Empty:
+            record = None
+        if record is WRITER_STOP:
+            break
+        if errors:
+            continue
+        try:
+            if record is not None:
+                out.write(orjson.dumps(record))
+                out.write(b"\n")
+                pending += 1
+            if pending and (pending >= WRITER_FLUSH_EVERY
+                            or time.monotonic() - last_flush >= WRITER_FLUSH_SECS):
+                out.flush()
+                pending = 0
+                last_flush = time.monotonic()
+        except Exception as e:
+            errors.append(e)
+    if not errors:
+        try:
+            out.flush()
+        except Exception as e:
+            errors.append(e)
+
+
+def check_writer(errors: list) -> None:
+    """Raise the writer thread's error, if it hit one."""
+    if errors:
+        raise RuntimeError(f"Writing output failed: {errors[0]}") from errors[0]
+
+
+def positive_int(value: str) -> int:
+    """argparse type for options that must be at least 1."""
+    n = int(value)
+    if n < 1:
+        raise argparse.ArgumentTypeError(f"must be at least 1, got {n}")
+    return n
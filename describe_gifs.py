@@ -1,7 +1,7 @@
 #!/usr/bin/env python3
 # /// script
 # requires-python = ">=3.11"
-# dependencies = ["google-genai", "Pillow"]
+# dependencies = ["google-genai", "Pillow", "aiohttp", "orjson"]
 # ///
 """
 Generate rich text descriptions of GIFs using Gemini 2.0 Flash Lite.
@@ -11,22 +11,40 @@ Usage:
     uv run describe_gifs.py --limit 100             # Test run on 100 GIFs
     uv run describe_gifs.py --limit 0 --resume      # Process all GIFs (resumable)
     uv run describe_gifs.py --limit 0 --workers 30  # Faster with more workers
+
+Pass --frame-cache to cache extracted frames under cache/frames/ (see
+frame_cache.py), so reruns skip decoding GIFs that were already seen. It is off
+by default: the cache is never evicted and grows to tens of GB for the full
+dataset, and --resume already skips GIFs that were described.
 """
 
 import argparse
+import asyncio
+import functools
+import hashlib
 import io
-import json
+import mmap
 import os
+import queue
+import re
 import sys
 import threading
 import time
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from array import array
+from bisect import bisect_left
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from itertools import groupby
 from pathlib import Path
-from urllib.request import urlopen, Request
 
+import aiohttp
+import orjson
 from PIL import Image
 from google import genai
-from google.genai import types
+from google.genai import errors, types
+
+from describe_common import (DESCRIPTION_FIELDS, PROMPT_PART, RESAMPLE, WRITER_STOP, check_writer,
+                             encode_frame, frame_indices, positive_int, write_jsonl)
+from frame_cache import DISABLE_ENV as FRAME_CACHE_DISABLE_ENV, disk_memoize
 
 # Config
 DEFAULT_TSV = "../datasets/TGIF-Release/data/tgif-v1.0.tsv"
@@ -36,23 +54,50 @@ API_KEY_PATH = os.path.expanduser("~/.tokens/gemini_api_key")
 # Gemini model - Flash Lite is cheapest
 MODEL_NAME = "gemini-2.0-flash-lite"
 
-# Prompt for generating multiple description types
-DESCRIPTION_PROMPT = """You are analyzing multiple frames extracted from an animated GIF. The frames are shown in chronological order.
+# Prompt for describing several GIFs in one request (format with n=<GIF count>).
+# Each GIF's frames follow a "GIF <number>:" text part.
+BATCH_PROMPT = """You are analyzing {n} separate animated GIFs. Each GIF is introduced by a "GIF <number>:" label, followed by frames extracted from it in chronological order.
 
-Analyze the FULL sequence of action across all frames and return a JSON object:
-- "literal": Factual description of the complete action/sequence (1-3 sentences, describe what happens from start to finish)
-- "source": Your best guess at where this is from — movie title, TV show, meme name, video game, news event, YouTube/TikTok trend, etc. Be specific (e.g., "Spy Kids (2001)" not just "movie"). Use "unknown" only if you genuinely cannot identify it.
-- "mood": Emotional tone or vibe (e.g., "funny", "wholesome", "chaotic", "satisfying")
-- "action": Key actions/verbs (e.g., "dancing", "falling", "celebrating")
-- "context": When someone might use this GIF in conversation (e.g., "reaction to good news")
-- "tags": Array of 5-10 searchable keywords (include character names, show titles, meme names if recognized)
+For EACH GIF, analyze the FULL sequence of action across its frames and describe it with a JSON object:
+- "gif": The number from the GIF's "GIF <number>:" label, as an integer
+""" + DESCRIPTION_FIELDS + """
 
-Respond with ONLY the JSON object, no markdown or extra text."""
+Respond with ONLY a JSON array of exactly {n} objects, one per GIF in the order shown, no markdown or extra text."""
 
 # Frame extraction settings
 NUM_FRAMES = 5
 MAX_FRAME_DIM = 512
 
+# Request batching: up to BATCH_SIZE GIFs per Gemini call, waiting at most
+# BATCH_FLUSH_MS for a batch to fill
+BATCH_SIZE = 8
+BATCH_FLUSH_MS = 200
+
+# Adaptive Gemini concurrency (AIMD): start at --workers in-flight calls, add a
+# permit every AIMD_INCREASE_EVERY successes (up to AIMD_MAX_FACTOR * --workers),
+# halve on rate limiting. Throttled calls are retried with exponential backoff.
+AIMD_INCREASE_EVERY = 50
+AIMD_MAX_FACTOR = 4
+THROTTLE_CODES = {429, 503}
+THROTTLE_RETRIES = 3
+THROTTLE_BACKOFF = 1.0
+# Returned by _call_limited when a call is still throttled after THROTTLE_RETRIES
+THROTTLED = "THROTTLED"
+
+# Download retries for transient failures, backing off DOWNLOAD_BACKOFF * 2^attempt seconds
+DOWNLOAD_RETRIES = 2
+DOWNLOAD_BACKOFF = 0.3
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+# Payload guards: reject bodies over MAX_GIF_BYTES or without an image signature
+MAX_GIF_BYTES = 20_000_000
+IMAGE_MAGIC = (b"GIF87a", b"GIF89a", b"\x89PNG")
+
+
+def _is_image_header(head: bytes) -> bool:
+    # WebP is a RIFF container; check the form type so AVI/WAV don't pass
+    return head.startswith(IMAGE_MAGIC) or (head[:4] == b"RIFF" and head[8:12] == b"WEBP")
+
 
 def load_api_key() -> str:
     """Load Gemini API key from file."""
@@ -60,71 +105,123 @@ def load_api_key() -> str:
         return f.read().strip().split()[0]  # First token, ignore comments
 
 
+# Old Tumblr CDN hosts that now live on 64.media.tumblr.com
+_OLD_TUMBLR_HOST = re.compile(r"(?:38|33|31)\.media\.tumblr\.com")
+
+
 def fix_tumblr_url(url: str) -> str:
     """Update old Tumblr CDN URLs to new domain."""
-    for old in ["38.media", "33.media", "31.media"]:
-        url = url.replace(f"{old}.tumblr.com", "64.media.tumblr.com")
-    return url
+    return _OLD_TUMBLR_HOST.sub("64.media.tumblr.com", url)
 
 
 def load_gifs(tsv_path: str, limit: int = 0) -> list[dict]:
     """Load GIFs from TGIF TSV file."""
     gifs = []
-    with open(tsv_path) as f:
-        for line in f:
-            parts = line.strip().split("\t", 1)
-            if len(parts) != 2:
-                continue
-            url, desc = parts
-            gifs.append({
-                "url": fix_tumblr_url(url),
-                "original_description": desc
-            })
-            if limit and len(gifs) >= limit:
-                break
+    with open(tsv_path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return gifs
+        # Scan the mapped file as bytes and only decode the two fields we keep
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            pos = 0
+            size = len(mm)
+            while pos < size:
+                end = mm.find(b"\n", pos)
+                if end == -1:
+                    end = size
+                line = mm[pos:end].strip()
+                pos = end + 1
+
+                url, sep, desc = line.partition(b"\t")
+                if not sep:
+                    continue
+                gifs.append({
+                    "url": fix_tumblr_url(url.decode("utf-8", "replace")),
+                    "original_description": desc.decode("utf-8", "replace")
+                })
+                if limit and len(gifs) >= limit:
+                    break
     return gifs
 
 
-def download_gif(url: str, timeout: int = 30) -> bytes | None:
-    """Download a GIF from URL and return bytes."""
+async def _read_gif_body(resp: aiohttp.ClientResponse, url: str) -> bytes | None:
+    """Read a response body, bailing out early on oversized or non-image payloads."""
+    if resp.content_length and resp.content_length > MAX_GIF_BYTES:
+        print(f"  Skipping oversized GIF ({resp.content_length} bytes): {url}", file=sys.stderr)
+        return None
+
     try:
-        req = Request(url, headers={"User-Agent": "Mozilla/5.0"})
-        with urlopen(req, timeout=timeout) as resp:
-            # Detect Tumblr removal redirects (copyright/guideline violations)
-            if "assets.tumblr.com/images/media_violation/" in resp.url:
-                print(f"  Skipping removed GIF: {url}", file=sys.stderr)
-                return None
-            return resp.read()
-    except Exception as e:
-        print(f"  Download error: {e}", file=sys.stderr)
+        head = await resp.content.readexactly(16)
+    except asyncio.IncompleteReadError as e:
+        head = e.partial
+    if not _is_image_header(head):
+        print(f"  Skipping non-image payload: {url}", file=sys.stderr)
         return None
 
+    # Content-Length may be missing or wrong, so enforce the cap while streaming
+    body = bytearray(head)
+    async for chunk in resp.content.iter_chunked(65536):
+        body += chunk
+        if len(body) > MAX_GIF_BYTES:
+            print(f"  Skipping oversized GIF (>{MAX_GIF_BYTES} bytes): {url}", file=sys.stderr)
+            return None
+    return bytes(body)
+
+
+async def download_gif(session: aiohttp.ClientSession, url: str, timeout: int = 30,
+                       retries: int = DOWNLOAD_RETRIES) -> bytes | None:
+    """Download a GIF from URL and return bytes, retrying transient failures."""
+    for attempt in range(1 + retries):
+        try:
+            async with session.get(url, timeout=aiohttp.ClientTimeout(total=timeout)) as resp:
+                # Detect Tumblr removal redirects (copyright/guideline violations)
+                if "assets.tumblr.com/images/media_violation/" in str(resp.url):
+                    print(f"  Skipping removed GIF: {url}", file=sys.stderr)
+                    return None
+                if resp.status not in RETRY_STATUSES or attempt == retries:
+                    resp.raise_for_status()
+                    return await _read_gif_body(resp, url)
+        except (aiohttp.ClientConnectionError, TimeoutError) as e:
+            if attempt == retries:
+                print(f"  Download error: {e}", file=sys.stderr)
+                return None
+        except Exception as e:
+            print(f"  Download error: {e}", file=sys.stderr)
+            return None
+        await asyncio.sleep(DOWNLOAD_BACKOFF * 2 ** attempt)
+    return None
+
+
+def _frames_key(gif_data: bytes, num_frames: int = NUM_FRAMES, max_dim: int = MAX_FRAME_DIM) -> str:
+    """Cache key for extract_frames: hash of the GIF bytes plus extraction settings."""
+    return f"{hashlib.sha256(gif_data).hexdigest()}:{num_frames}:{max_dim}"
+
 
-def extract_frames(gif_data: bytes, num_frames: int = NUM_FRAMES, max_dim: int = MAX_FRAME_DIM) -> list[bytes]:
-    """Extract evenly-spaced frames from a GIF as PNG bytes, resizing if needed."""
+# TGIF URLs are unique, so an in-memory LRU would almost never hit and only
+# hold frames in every worker process; rely on the disk cache alone
+@disk_memoize(key=_frames_key, version=3, maxsize=0)
+def extract_frames(gif_data: bytes, num_frames: int = NUM_FRAMES, max_dim: int = MAX_FRAME_DIM) -> list[tuple[bytes, str]]:
+    """Extract evenly-spaced frames from a GIF as (data, mime_type) pairs, resizing if needed."""
     img = Image.open(io.BytesIO(gif_data))
     n_frames = getattr(img, "n_frames", 1)
 
     # Pick frame indices: evenly spaced including first and last
-    if n_frames <= num_frames:
-        indices = list(range(n_frames))
-    else:
-        indices = [round(i * (n_frames - 1) / (num_frames - 1)) for i in range(num_frames)]
+    indices = frame_indices(n_frames, num_frames)
 
+    # Indices ascend, and Pillow's GIF seek() decodes forward from the current
+    # frame (it only rewinds to frame 0 when seeking backwards), so each frame
+    # is decoded at most once and decoding stops at the last wanted index
     frames = []
     for idx in indices:
         img.seek(idx)
-        frame = img.convert("RGBA")
+        # JPEG has no alpha; only keep it for frames that are transparent
+        # (Pillow decodes GIF frames after the first as RGB/RGBA, not P)
+        transparent = img.mode in ("RGBA", "LA", "PA") or "transparency" in img.info
+        frame = img.convert("RGBA" if transparent else "RGB")
 
         # Resize if too large
-        w, h = frame.size
-        if max(w, h) > max_dim:
-            scale = max_dim / max(w, h)
-            frame = frame.resize((round(w * scale), round(h * scale)), Image.LANCZOS)
+        frame.thumbnail((max_dim, max_dim), RESAMPLE)
 
-        buf = io.BytesIO()
-        frame.save(buf, format="PNG")
-        frames.append(buf.getvalue())
+        frames.append(encode_frame(frame))
 
     return frames
 
@@ -138,16 +235,16 @@ def _clean_json_text(text: str) -> str:
     return text
 
 
-def describe_gif_from_data(client, gif_data: bytes, gif_url: str, retries: int = 1) -> dict | None:
-    """Generate descriptions for a GIF from its raw bytes using Gemini."""
-    try:
-        # Extract key frames
-        frames = extract_frames(gif_data)
+def describe_frames(client, frames: list[tuple[bytes, str]], retries: int = 1) -> dict | None:
+    """Generate descriptions for one GIF from its extracted frames using Gemini.
 
-        # Build parts: prompt + each frame as a PNG
-        parts = [types.Part.from_text(text=DESCRIPTION_PROMPT)]
-        for frame_png in frames:
-            parts.append(types.Part.from_bytes(data=frame_png, mime_type="image/png"))
+    Rate-limit errors (THROTTLE_CODES) are raised rather than swallowed.
+    """
+    try:
+        # Build parts: prompt + each encoded frame
+        parts = [PROMPT_PART]
+        for frame_data, mime_type in frames:
+            parts.append(types.Part.from_bytes(data=frame_data, mime_type=mime_type))
 
         for attempt in range(1 + retries):
             try:
@@ -156,38 +253,407 @@ def describe_gif_from_data(client, gif_data: bytes, gif_url: str, retries: int =
                     contents=[types.Content(parts=parts)]
                 )
                 text = _clean_json_text(response.text)
-                return json.loads(text)
-            except json.JSONDecodeError as e:
+                return orjson.loads(text)
+            except orjson.JSONDecodeError as e:
                 if attempt < retries:
                     print(f"  JSON parse error (retrying): {e}", file=sys.stderr)
                 else:
                     print(f"  JSON parse error (giving up): {e}", file=sys.stderr)
                     print(f"    Raw response: {response.text[:300]}", file=sys.stderr)
 
+        return None
+    except errors.APIError as e:
+        if e.code in THROTTLE_CODES:
+            raise  # let the limiter back off
+        print(f"  API error: {e}", file=sys.stderr)
         return None
     except Exception as e:
         print(f"  API error: {e}", file=sys.stderr)
         return None
 
 
+@functools.lru_cache(maxsize=None)
+def _batch_prompt_part(n: int) -> types.Part:
+    return types.Part.from_text(text=BATCH_PROMPT.format(n=n))
+
+
+@functools.lru_cache(maxsize=None)
+def _gif_label_part(i: int) -> types.Part:
+    return types.Part.from_text(text=f"GIF {i}:")
+
+
+def describe_frames_batch(client, batch: list[list[tuple[bytes, str]]]) -> list[dict | None]:
+    """Describe several GIFs in a single Gemini request.
+
+    Results are matched to GIFs by their "gif" number, not their position,
+    and the number is dropped from the returned descriptions. Returns one
+    entry per GIF, in order; GIFs with no result, or with more than one, are
+    None so the caller can retry them individually. Rate-limit errors
+    (THROTTLE_CODES) are raised rather than swallowed.
+    """
+    parts = [_batch_prompt_part(len(batch))]
+    for i, frames in enumerate(batch, 1):
+        parts.append(_gif_label_part(i))
+        for frame_data, mime_type in frames:
+            parts.append(types.Part.from_bytes(data=frame_data, mime_type=mime_type))
+
+    try:
+        response = client.models.generate_content(
+            model=MODEL_NAME,
+            contents=[types.Content(parts=parts)]
+        )
+        results = orjson.loads(_clean_json_text(response.text))
+    except orjson.JSONDecodeError as e:
+        print(f"  Batch JSON parse error: {e}", file=sys.stderr)
+        return [None] * len(batch)
+    except errors.APIError as e:
+        if e.code in THROTTLE_CODES:
+            raise  # let the limiter back off
+        print(f"  Batch API error: {e}", file=sys.stderr)
+        return [None] * len(batch)
+    except Exception as e:
+        print(f"  Batch API error: {e}", file=sys.stderr)
+        return [None] * len(batch)
+
+    if not isinstance(results, list):
+        print(f"  Batch returned {type(results).__name__}, not a list", file=sys.stderr)
+        return [None] * len(batch)
+
+    by_number: dict[int, list[dict]] = {}
+    for r in results:
+        if not isinstance(r, dict):
+            continue
+        number = r.pop("gif", None)
+        if type(number) is int and 1 <= number <= len(batch):
+            by_number.setdefault(number, []).append(r)
+    # Missing and duplicated numbers both leave the GIF unmatched
+    matched = []
+    for number in range(1, len(batch) + 1):
+        matches = by_number.get(number, [])
+        matched.append(matches[0] if len(matches) == 1 else None)
+    if None in matched:
+        print(f"  Batch matched {len(batch) - matched.count(None)}/{len(batch)} GIFs "
+              f"from {len(results)} results", file=sys.stderr)
+    return matched
+
+
+class AimdLimiter:
+    """Async concurrency limit for Gemini calls that adapts to rate limiting.
+
+    Additive increase: every `increase_every` successful calls add one permit,
+    up to `maximum`. Multiplicative decrease: a throttled call halves the
+    permit count (at most once per `cooldown` seconds, so a burst of 429s from
+    the same overload counts once). Permit changes are logged to stderr.
+    """
+
+    def __init__(self, initial: int, maximum: int,
+                 increase_every: int = AIMD_INCREASE_EVERY, cooldown: float = 1.0):
+        self.limit = initial
+        self.maximum = maximum
+        self.increase_every = increase_every
+        self.cooldown = cooldown
+        self._sem = asyncio.Semaphore(initial)
+        self._oks = 0
+        self._last_decrease = 0.0
+        self._retiring = set()
+
+    async def __aenter__(self):
+        await self._sem.acquire()
+
+    async def __aexit__(self, *exc):
+        self._sem.release()
+
+    def on_ok(self) -> None:
+        self._oks += 1
+        if self._oks >= self.increase_every and self.limit < self.maximum:
+            self._oks = 0
+            self.limit += 1
+            self._sem.release()
+            print(f"  Gemini concurrency: {self.limit - 1} -> {self.limit}", file=sys.stderr)
+
+    def on_throttle(self) -> None:
+        now = time.monotonic()
+        if now - self._last_decrease < self.cooldown:
+            return
+        self._last_decrease = now
+        self._oks = 0
+        new_limit = max(1, self.limit // 2)
+        if new_limit == self.limit:
+            return
+        print(f"  Gemini concurrency: {self.limit} -> {new_limit} (throttled)", file=sys.stderr)
+        # Retire permits by acquiring them without ever releasing; this waits
+        # for in-flight calls to finish rather than cancelling them
+        task = asyncio.create_task(self._retire(self.limit - new_limit))
+        self._retiring.add(task)
+        task.add_done_callback(self._retiring.discard)
+        self.limit = new_limit
+
+    async def _retire(self, permits: int) -> None:
+        for _ in range(permits):
+            await self._sem.acquire()
+
+
+async def _call_limited(limiter: AimdLimiter, executor: ThreadPoolExecutor, fn, *args):
+    """Run a blocking Gemini call in executor under the limiter.
+
+    Throttled calls shrink the limit and are retried with backoff; returns
+    THROTTLED if they are still throttled after THROTTLE_RETRIES.
+    """
+    loop = asyncio.get_running_loop()
+    for attempt in range(1 + THROTTLE_RETRIES):
+        try:
+            async with limiter:
+                result = await loop.run_in_executor(executor, fn, *args)
+        except errors.APIError as e:
+            limiter.on_throttle()
+            if attempt == THROTTLE_RETRIES:
+                print(f"  API error (still throttled, giving up): {e}", file=sys.stderr)
+                return THROTTLED
+            await asyncio.sleep(THROTTLE_BACKOFF * 2 ** attempt)
+            continue
+        limiter.on_ok()
+        return result
+    return THROTTLED
+
+
+async def _dispatch_batch(client, executor: ThreadPoolExecutor, limiter: AimdLimiter,
+                          batch: list[tuple]) -> None:
+    """Describe a batch of (frames, future) requests and resolve their futures."""
+    frame_lists = [frames for frames, _ in batch]
+    try:
+        if len(batch) == 1:
+            results = [await _call_limited(limiter, executor, describe_frames, client, frame_lists[0])]
+        else:
+            results = await _call_limited(limiter, executor, describe_frames_batch, client, frame_lists)
+            if results is THROTTLED:
+                # Splitting a throttled batch into single calls would only add
+                # load; count every GIF in it as failed
+                results = [None] * len(batch)
+            else:
+                # Partial failure: re-submit the failing GIFs one at a time
+                retry = [i for i, r in enumerate(results) if r is None]
+                singles = await asyncio.gather(*(
+                    _call_limited(limiter, executor, describe_frames, client, frame_lists[i])
+                    for i in retry
+                ))
+                for i, r in zip(retry, singles):
+                    results[i] = r
+        results = [None if r is THROTTLED else r for r in results]
+    except Exception as e:
+        print(f"  Batch error: {e}", file=sys.stderr)
+        results = [None] * len(batch)
+
+    for (_, future), result in zip(batch, results):
+        if not future.done():
+            future.set_result(result)
+
+
+async def batch_describer(client, executor: ThreadPoolExecutor, limiter: AimdLimiter,
+                          queue: asyncio.Queue, batch_size: int = BATCH_SIZE,
+                          flush_ms: int = BATCH_FLUSH_MS) -> None:
+    """Coalesce queued (frames, future) requests into multi-GIF Gemini calls.
+
+    After the first request arrives, waits up to flush_ms for the batch to fill,
+    then dispatches it in the background and starts collecting the next one.
+    Runs until cancelled.
+    """
+    loop = asyncio.get_running_loop()
+    in_flight = set()
+    while True:
+        batch = [await queue.get()]
+        deadline = loop.time() + flush_ms / 1000
+        while len(batch) < batch_size:
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(queue.get(), timeout))
+            except TimeoutError:
+                break
+
+        task = asyncio.create_task(_dispatch_batch(client, executor, limiter, batch))
+        in_flight.add(task)
+        task.add_done_callback(in_flight.discard)
+
+
 # Sentinel to distinguish "removed GIF" from "API/parse failure"
 REMOVED = "REMOVED"
 
 
-def process_gif(client, gif: dict) -> dict | str | None:
-    """Process a single GIF. Returns dict on success, REMOVED for skipped GIFs, None on failure."""
-    gif_data = download_gif(gif["url"])
-    if gif_data is None:
-        return REMOVED
+async def _feed(gifs: list[dict], urls_q: asyncio.Queue) -> None:
+    """Push GIFs into the pipeline as the download stage makes room."""
+    for gif in gifs:
+        await urls_q.put(gif)
+
+
+async def download_stage(session: aiohttp.ClientSession, urls_q: asyncio.Queue,
+                         decoded_q: asyncio.Queue, results_q: asyncio.Queue) -> None:
+    """Stage A: download GIFs and pass their bytes on to frame extraction."""
+    while True:
+        gif = await urls_q.get()
+        gif_data = await download_gif(session, gif["url"])
+        if gif_data is None:
+            results_q.put_nowait((gif, REMOVED))
+        else:
+            await decoded_q.put((gif, gif_data))
+
+
+async def extract_stage(cpu_pool: Executor, decoded_q: asyncio.Queue, describe_q: asyncio.Queue,
+                        api_slots: asyncio.Semaphore, results_q: asyncio.Queue) -> None:
+    """Stage B: extract frames in the process pool and queue them for Gemini."""
+    loop = asyncio.get_running_loop()
+    while True:
+        gif, gif_data = await decoded_q.get()
+        # Pillow decoding runs in a worker process so it isn't serialized on the GIL
+        try:
+            frames = await loop.run_in_executor(cpu_pool, extract_frames, gif_data)
+        except Exception as e:
+            print(f"  Frame extraction error: {e}", file=sys.stderr)
+            results_q.put_nowait((gif, None))
+            continue
+
+        # Stage C (batch_describer) resolves the future; the slot bounds how
+        # many GIFs can be waiting on Gemini at once
+        await api_slots.acquire()
+        future = loop.create_future()
+        future.add_done_callback(functools.partial(_on_described, gif, api_slots, results_q))
+        await describe_q.put((frames, future))
+
+
+def _on_described(gif: dict, api_slots: asyncio.Semaphore, results_q: asyncio.Queue,
+                  future: asyncio.Future) -> None:
+    api_slots.release()
+    results_q.put_nowait((gif, future.result()))
+
+
+async def run(client, to_process: list[dict], args) -> tuple[int, int, int]:
+    """Describe all GIFs. Returns (success, failed, removed) counts.
+
+    Work flows through three stages connected by bounded queues, so downloads,
+    frame extraction and Gemini calls for different GIFs overlap:
+      A. --workers download coroutines
+      B. one extraction coroutine per CPU, each driving the process pool
+      C. batch_describer, issuing Gemini calls under the AIMD limiter
+    """
+    # Results are drained here on the event loop thread, so counters need no
+    # lock; the writer thread owns the output file
+    success = 0
+    failed = 0
+    removed = 0
+    start = time.time()
+
+    cpu_workers = os.cpu_count() or 1
+    urls_q = asyncio.Queue(maxsize=2 * args.workers)
+    decoded_q = asyncio.Queue(maxsize=2 * args.workers)
+    describe_q = asyncio.Queue()
+    results_q = asyncio.Queue()
+    # Enough GIFs waiting on Gemini to fill full batches for every permit the
+    # AIMD limiter can grow to, plus one round queued behind them
+    api_slots = asyncio.Semaphore((AIMD_MAX_FACTOR + 1) * args.workers * args.batch_size)
+
+    # One pooled session for every download, so keep-alive connections to the
+    # CDN are reused instead of paying a TCP + TLS handshake per GIF
+    connector = aiohttp.TCPConnector(limit=args.workers, ttl_dns_cache=300)
+    # Unbounded so queueing a record never blocks the event loop; records are
+    # small and the writer drains them far faster than Gemini produces them
+    writer_q = queue.Queue()
+    writer_errors = []
+    output_mode = "ab" if args.resume else "wb"
+    with open(args.output, output_mode) as out:
+        if output_mode == "ab" and out.tell():
+            # Start on a fresh line if a previous run was cut off mid-record
+            with open(args.output, "rb") as f:
+                f.seek(-1, os.SEEK_END)
+                if f.read(1) != b"\n":
+                    out.write(b"\n")
+        writer = threading.Thread(target=write_jsonl, args=(writer_q, out, writer_errors), daemon=True)
+        writer.start()
+        try:
+            # Processes for frame extraction (CPU), threads for blocking Gemini calls (I/O)
+            with ProcessPoolExecutor(max_workers=cpu_workers) as cpu_pool, \
+                    ThreadPoolExecutor(max_workers=args.workers * AIMD_MAX_FACTOR) as io_pool:
+                limiter = AimdLimiter(args.workers, args.workers * AIMD_MAX_FACTOR)
+                async with aiohttp.ClientSession(connector=connector,
+                                                 headers={"User-Agent": "Mozilla/5.0"}) as session:
+                    tasks = [
+                        asyncio.create_task(_feed(to_process, urls_q)),
+                        asyncio.create_task(batch_describer(client, io_pool, limiter, describe_q,
+                                                            batch_size=args.batch_size)),
+                    ]
+                    tasks += [
+                        asyncio.create_task(download_stage(session, urls_q, decoded_q, results_q))
+                        for _ in range(args.workers)
+                    ]
+                    tasks += [
+                        asyncio.create_task(extract_stage(cpu_pool, decoded_q, describe_q,
+                                                          api_slots, results_q))
+                        for _ in range(cpu_workers)
+                    ]
+
+                    try:
+                        for done in range(1, len(to_process) + 1):
+                            gif, descriptions = await results_q.get()
+                            if descriptions is REMOVED:
+                                removed += 1
+                            elif descriptions:
+                                check_writer(writer_errors)
+                                writer_q.put_nowait({
+                                    "url": gif["url"],
+                                    "original_description": gif["original_description"],
+                                    **descriptions
+                                })
+                                success += 1
+                            else:
+                                failed += 1
+
+                            if done % 10 == 0 or done == len(to_process):
+                                elapsed = time.time() - start
+                                rate = done / elapsed if elapsed > 0 else 0
+                                msg = (f"  Progress: {done}/{len(to_process)} — "
+                                       f"{success} ok, {failed} failed, {removed} removed "
+                                       f"({rate:.1f}/sec)")
+                                print(f"\r{msg}\033[K", end="", flush=True)
+                    finally:
+                        for task in tasks:
+                            task.cancel()
+                        await asyncio.gather(*tasks, return_exceptions=True)
+        finally:
+            writer_q.put(WRITER_STOP)
+            writer.join()
+    check_writer(writer_errors)
+
+    return success, failed, removed
+
+
+def _url_fingerprint(url: str) -> int:
+    """64-bit fingerprint of a URL, used instead of the URL in the resume set."""
+    return int.from_bytes(hashlib.blake2b(url.encode(), digest_size=8).digest(), "little")
+
+
+def load_processed(output_path: str) -> array:
+    """Load fingerprints of URLs already in the output JSONL.
+
+    Stored as a sorted array of unsigned 64-bit ints (8 bytes per URL rather
+    than a set of full URL strings) and queried with is_processed(). Lines
+    that don't decode (e.g. one cut off by an interrupted run) are skipped,
+    so those GIFs are described again.
+    """
+    fingerprints = []
+    with open(output_path, "rb") as f:
+        for line in f:
+            try:
+                fingerprints.append(_url_fingerprint(orjson.loads(line)["url"]))
+            except (orjson.JSONDecodeError, KeyError, TypeError):
+                pass
+    fingerprints.sort()
+    return array("Q", (fp for fp, _ in groupby(fingerprints)))
+
 
-    descriptions = describe_gif_from_data(client, gif_data, gif["url"])
-    if descriptions:
-        return {
-            "url": gif["url"],
-            "original_description": gif["original_description"],
-            **descriptions
-        }
-    return None
+def is_processed(processed: array, url: str) -> bool:
+    """Check a URL against the sorted fingerprints from load_processed()."""
+    fp = _url_fingerprint(url)
+    i = bisect_left(processed, fp)
+    return i < len(processed) and processed[i] == fp
 
 
 def main():
@@ -196,8 +662,16 @@ def main():
     parser.add_argument("--limit", type=int, default=100, help="Limit GIFs to process (0=all)")
     parser.add_argument("--output", default=OUTPUT_FILE, help="Output JSONL file")
     parser.add_argument("--resume", action="store_true", help="Resume from existing output")
-    parser.add_argument("--workers", type=int, default=20, help="Number of concurrent workers (default: 20)")
+    parser.add_argument("--workers", type=positive_int, default=20,
+                        help="Number of concurrent workers (default: 20)")
+    parser.add_argument("--batch-size", type=positive_int, default=BATCH_SIZE,
+                        help=f"GIFs per Gemini request (default: {BATCH_SIZE}, 1=no batching)")
+    parser.add_argument("--frame-cache", action="store_true",
+                        help="Cache extracted frames on disk under cache/frames/ (not evicted)")
     args = parser.parse_args()
+    if not args.frame_cache:
+        # Set before any process pool starts so worker processes inherit it
+        os.environ[FRAME_CACHE_DISABLE_ENV] = "1"
 
     # Setup Gemini client (new API)
     api_key = load_api_key()
@@ -209,57 +683,21 @@ def main():
     print(f"Loaded {len(gifs)} GIFs")
 
     # Check for existing progress
-    processed_urls = set()
+    processed = array("Q")
     if args.resume and Path(args.output).exists():
-        with open(args.output) as f:
-            for line in f:
-                data = json.loads(line)
-                processed_urls.add(data["url"])
-        print(f"Resuming: {len(processed_urls)} already processed")
+        processed = load_processed(args.output)
+        print(f"Resuming: {len(processed)} already processed")
 
     # Filter out already-processed GIFs
-    to_process = [g for g in gifs if g["url"] not in processed_urls]
+    to_process = [g for g in gifs if not is_processed(processed, g["url"])]
     print(f"{len(to_process)} GIFs to process with {args.workers} workers")
 
     if not to_process:
         print("Nothing to do!")
         return
 
-    # Thread-safe counters and file writing
-    lock = threading.Lock()
-    success = 0
-    failed = 0
-    removed = 0
     start = time.time()
-
-    output_mode = "a" if args.resume else "w"
-    with open(args.output, output_mode) as out:
-        with ThreadPoolExecutor(max_workers=args.workers) as executor:
-            futures = {
-                executor.submit(process_gif, client, gif): gif
-                for gif in to_process
-            }
-
-            for future in as_completed(futures):
-                result = future.result()
-                with lock:
-                    if result is REMOVED:
-                        removed += 1
-                    elif result:
-                        out.write(json.dumps(result) + "\n")
-                        out.flush()
-                        success += 1
-                    else:
-                        failed += 1
-
-                    done = success + failed + removed
-                    if done % 10 == 0 or done == len(to_process):
-                        elapsed = time.time() - start
-                        rate = done / elapsed if elapsed > 0 else 0
-                        msg = (f"  Progress: {done}/{len(to_process)} — "
-                               f"{success} ok, {failed} failed, {removed} removed "
-                               f"({rate:.1f}/sec)")
-                        print(f"\r{msg}\033[K", end="", flush=True)
+    success, failed, removed = asyncio.run(run(client, to_process, args))
 
     print()  # finish the progress line
     elapsed = time.time() - start
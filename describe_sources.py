@@ -1,7 +1,7 @@
 #!/usr/bin/env python3
 # /// script
 # requires-python = ">=3.11"
-# dependencies = ["google-genai", "Pillow"]
+# dependencies = ["google-genai", "Pillow", "av", "orjson"]
 # ///
 """
 Generate rich text descriptions of GIFs/videos from source manifests using Gemini.
@@ -16,24 +16,32 @@ Usage:
     uv run describe_sources.py --source kidmograph      # Single source
     uv run describe_sources.py --limit 10 --workers 5   # Limited run
     uv run describe_sources.py --force                  # Re-describe all
+
+Extracted frames are cached under cache/frames/ (see frame_cache.py), keyed on
+each file's path, mtime and size. Pass --no-frame-cache to skip the cache.
 """
 
 import argparse
 import io
-import json
 import os
-import subprocess
+import queue
 import sys
-import tempfile
 import threading
 import time
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from functools import cached_property
 from pathlib import Path
 
+import av
+import orjson
 from PIL import Image
 from google import genai
 from google.genai import types
 
+from describe_common import (PROMPT_PART, RESAMPLE, WRITER_STOP, check_writer, encode_frame,
+                             frame_indices, positive_int, write_jsonl)
+from frame_cache import DISABLE_ENV as FRAME_CACHE_DISABLE_ENV, disk_memoize
+
 # Config
 SOURCES_DIR = Path(__file__).parent / "sources"
 API_KEY_PATH = os.path.expanduser("~/.tokens/gemini_api_key")
@@ -43,19 +51,6 @@ MODEL_NAME = "gemini-2.0-flash-lite"
 NUM_FRAMES = 5
 MAX_FRAME_DIM = 512
 
-# Same prompt as describe_gifs.py
-DESCRIPTION_PROMPT = """You are analyzing multiple frames extracted from an animated GIF. The frames are shown in chronological order.
-
-Analyze the FULL sequence of action across all frames and return a JSON object:
-- "literal": Factual description of the complete action/sequence (1-3 sentences, describe what happens from start to finish)
-- "source": Your best guess at where this is from — movie title, TV show, meme name, video game, news event, YouTube/TikTok trend, etc. Be specific (e.g., "Spy Kids (2001)" not just "movie"). Use "unknown" only if you genuinely cannot identify it.
-- "mood": Emotional tone or vibe (e.g., "funny", "wholesome", "chaotic", "satisfying")
-- "action": Key actions/verbs (e.g., "dancing", "falling", "celebrating")
-- "context": When someone might use this GIF in conversation (e.g., "reaction to good news")
-- "tags": Array of 5-10 searchable keywords (include character names, show titles, meme names if recognized)
-
-Respond with ONLY the JSON object, no markdown or extra text."""
-
 
 def load_api_key() -> str:
     with open(API_KEY_PATH) as f:
@@ -78,15 +73,93 @@ def find_sources(source_filter: str | None = None) -> list[Path]:
 
 
 def load_manifest(source_dir: Path) -> dict:
-    with open(source_dir / "manifest.json") as f:
-        return json.load(f)
+    return orjson.loads((source_dir / "manifest.json").read_bytes())
 
 
 def save_manifest(source_dir: Path, manifest: dict) -> None:
-    tmp = (source_dir / "manifest.json").with_suffix(".tmp")
-    with open(tmp, "w") as f:
-        json.dump(manifest, f, indent=2)
-    tmp.rename(source_dir / "manifest.json")
+    final = source_dir / "manifest.json"
+    tmp = final.with_suffix(".tmp")
+    tmp.write_bytes(orjson.dumps(manifest, option=orjson.OPT_INDENT_2))
+    os.replace(tmp, final)
+
+
+class ManifestView:
+    """A source's manifest plus its item counts, each computed at most once.
+
+    The counts are also stored in a .manifest_index.json sidecar keyed by the
+    manifest's mtime and size, so a source whose manifest hasn't changed can
+    be reported (and skipped when fully described) without parsing it.
+    """
+
+    def __init__(self, source_dir: Path):
+        self.source_dir = source_dir
+        self.index_path = source_dir / ".manifest_index.json"
+        self._stamp = self._manifest_stamp()
+
+    def _manifest_stamp(self) -> list[int]:
+        st = (self.source_dir / "manifest.json").stat()
+        return [st.st_mtime_ns, st.st_size]
+
+    @cached_property
+    def manifest(self) -> dict:
+        return load_manifest(self.source_dir)
+
+    @cached_property
+    def counts(self) -> dict:
+        try:
+            index = orjson.loads(self.index_path.read_bytes())
+            if index.get("stamp") == self._stamp:
+                return index["counts"]
+        except (OSError, orjson.JSONDecodeError, KeyError, AttributeError):
+            pass
+        return self._index()
+
+    def _index(self) -> dict:
+        """Count items in a single pass and refresh the sidecar."""
+        counts = {"source": self.manifest["source"], "total": 0,
+                  "downloaded": 0, "described": 0, "pending": 0}
+        for item in self.manifest["items"]:
+            counts["total"] += 1
+            downloaded = bool(item.get("downloaded"))
+            described = bool(item.get("described"))
+            counts["downloaded"] += downloaded
+            counts["described"] += described
+            counts["pending"] += downloaded and not described
+
+        tmp = self.index_path.with_suffix(".tmp")
+        try:
+            tmp.write_bytes(orjson.dumps({"stamp": self._stamp, "counts": counts}))
+            os.replace(tmp, self.index_path)
+        except OSError as e:
+            print(f"  Could not write {self.index_path}: {e}", file=sys.stderr)
+        return counts
+
+    @property
+    def source(self) -> str:
+        return self.counts["source"]
+
+    @property
+    def total(self) -> int:
+        return self.counts["total"]
+
+    @property
+    def downloaded_count(self) -> int:
+        return self.counts["downloaded"]
+
+    @property
+    def described_count(self) -> int:
+        return self.counts["described"]
+
+    @property
+    def pending_count(self) -> int:
+        """Items downloaded but not yet described."""
+        return self.counts["pending"]
+
+    def save(self) -> None:
+        """Save the (mutated) manifest and re-index it."""
+        save_manifest(self.source_dir, self.manifest)
+        self._stamp = self._manifest_stamp()
+        self.counts = self._index()
 
 
 def items_needing_description(manifest: dict, force: bool = False) -> list[dict]:
@@ -98,97 +171,94 @@ def items_needing_description(manifest: dict, force: bool = False) -> list[dict]
 
 
 def extract_frames_gif(file_path: Path, num_frames: int = NUM_FRAMES,
-                       max_dim: int = MAX_FRAME_DIM) -> list[bytes]:
-    """Extract evenly-spaced frames from a GIF as PNG bytes."""
-    img = Image.open(file_path)
+                       max_dim: int = MAX_FRAME_DIM) -> list[tuple[bytes, str]]:
+    """Extract evenly-spaced frames from a GIF as (data, mime_type) pairs."""
+    # Slurp the file in one read so Pillow's many small seek/read calls are
+    # served from memory instead of each becoming a syscall
+    img = Image.open(io.BytesIO(file_path.read_bytes()))
     n_frames = getattr(img, "n_frames", 1)
 
-    if n_frames <= num_frames:
-        indices = list(range(n_frames))
-    else:
-        indices = [round(i * (n_frames - 1) / (num_frames - 1)) for i in range(num_frames)]
+    # Pick frame indices: evenly spaced including first and last
+    indices = frame_indices(n_frames, num_frames)
 
+    # Indices ascend, and Pillow's GIF seek() decodes forward from the current
+    # frame (it only rewinds to frame 0 when seeking backwards), so each frame
+    # is decoded at most once and decoding stops at the last wanted index
     frames = []
     for idx in indices:
         img.seek(idx)
-        frame = img.convert("RGBA")
+        # JPEG has no alpha; only keep it for frames that are transparent
+        # (Pillow decodes GIF frames after the first as RGB/RGBA, not P)
+        transparent = img.mode in ("RGBA", "LA", "PA") or "transparency" in img.info
+        frame = img.convert("RGBA" if transparent else "RGB")
 
-        w, h = frame.size
-        if max(w, h) > max_dim:
-            scale = max_dim / max(w, h)
-            frame = frame.resize((round(w * scale), round(h * scale)), Image.LANCZOS)
+        frame.thumbnail((max_dim, max_dim), RESAMPLE)
 
-        buf = io.BytesIO()
-        frame.save(buf, format="PNG")
-        frames.append(buf.getvalue())
+        frames.append(encode_frame(frame))
 
     return frames
 
 
 def extract_frames_mp4(file_path: Path, num_frames: int = NUM_FRAMES,
-                       max_dim: int = MAX_FRAME_DIM) -> list[bytes]:
-    """Extract evenly-spaced frames from an MP4/WebM using ffmpeg."""
-    # Get video duration and frame count
-    probe = subprocess.run(
-        ["ffprobe", "-v", "quiet", "-print_format", "json",
-         "-show_streams", str(file_path)],
-        capture_output=True, text=True
-    )
-    if probe.returncode != 0:
-        raise RuntimeError(f"ffprobe failed: {probe.stderr}")
-
-    streams = json.loads(probe.stdout)
-    video_stream = next(
-        (s for s in streams.get("streams", []) if s["codec_type"] == "video"),
-        None
-    )
-    if not video_stream:
-        raise RuntimeError("No video stream found")
-
-    # Get duration (try multiple fields)
-    duration = float(video_stream.get("duration", 0))
-    if duration == 0:
-        # Try nb_frames / fps
-        nb = int(video_stream.get("nb_frames", 0))
-        r_frame_rate = video_stream.get("r_frame_rate", "30/1")
-        num, den = map(int, r_frame_rate.split("/"))
-        if nb > 0 and num > 0:
-            duration = nb * den / num
-
-    if duration <= 0:
-        # Fallback: just grab the first frame
-        duration = 1.0
-
-    # Calculate timestamps for evenly-spaced frames
-    if num_frames == 1:
-        timestamps = [0.0]
-    else:
-        timestamps = [i * duration / (num_frames - 1) for i in range(num_frames)]
-        # Clamp last timestamp slightly before end
-        timestamps[-1] = min(timestamps[-1], max(0, duration - 0.01))
-
-    frames = []
-    with tempfile.TemporaryDirectory() as tmpdir:
-        for i, ts in enumerate(timestamps):
-            out_path = os.path.join(tmpdir, f"frame_{i}.png")
-            cmd = [
-                "ffmpeg", "-v", "quiet",
-                "-ss", f"{ts:.3f}",
-                "-i", str(file_path),
-                "-frames:v", "1",
-                "-vf", f"scale='min({max_dim},iw)':'min({max_dim},ih)':force_original_aspect_ratio=decrease",
-                out_path
-            ]
-            subprocess.run(cmd, capture_output=True)
-            if os.path.exists(out_path):
-                frames.append(Path(out_path).read_bytes())
+                       max_dim: int = MAX_FRAME_DIM) -> list[tuple[bytes, str]]:
+    """Extract evenly-spaced frames from an MP4/WebM in-process with PyAV."""
+    with av.open(str(file_path)) as container:
+        if not container.streams.video:
+            raise RuntimeError("No video stream found")
+        stream = container.streams.video[0]
+        stream.thread_type = "AUTO"
+
+        # Get duration (stream first, then container)
+        duration = 0.0
+        if stream.duration and stream.time_base:
+            duration = float(stream.duration * stream.time_base)
+        elif container.duration:
+            duration = container.duration / av.time_base
+
+        if duration <= 0:
+            # Fallback: just grab the first frame
+            duration = 1.0
+
+        # Calculate timestamps for evenly-spaced frames
+        if num_frames == 1:
+            timestamps = [0.0]
+        else:
+            timestamps = [i * duration / (num_frames - 1) for i in range(num_frames)]
+            # Clamp last timestamp slightly before end
+            timestamps[-1] = min(timestamps[-1], max(0, duration - 0.01))
+
+        start = float(stream.start_time * stream.time_base) if stream.start_time else 0.0
+
+        frames = []
+        for ts in timestamps:
+            # Seek to the keyframe before ts, then decode forward to ts
+            target = start + ts
+            container.seek(int(target / stream.time_base), stream=stream)
+            decoded = None
+            for decoded in container.decode(stream):
+                if decoded.time is not None and decoded.time >= target:
+                    break
+            if decoded is None:
+                continue
+
+            frame = decoded.to_image()
+            frame.thumbnail((max_dim, max_dim), RESAMPLE)
+
+            frames.append(encode_frame(frame))
 
     if not frames:
-        raise RuntimeError("ffmpeg extracted no frames")
+        raise RuntimeError("No frames decoded")
     return frames
 
 
-def extract_frames(file_path: Path, fmt: str) -> list[bytes]:
+def _frames_key(file_path: Path, fmt: str) -> str:
+    """Cache key for extract_frames: local files are identified by path, mtime and size."""
+    st = file_path.stat()
+    return f"{file_path.resolve()}:{st.st_mtime_ns}:{st.st_size}:{fmt}:{NUM_FRAMES}:{MAX_FRAME_DIM}"
+
+
+@disk_memoize(key=_frames_key, version=5)
+def extract_frames(file_path: Path, fmt: str) -> list[tuple[bytes, str]]:
     """Dispatch to the right frame extractor based on format."""
     if fmt in ("mp4", "webm"):
         return extract_frames_mp4(file_path)
@@ -196,23 +266,27 @@ def extract_frames(file_path: Path, fmt: str) -> list[bytes]:
         return extract_frames_gif(file_path)
 
 
-def describe_item(client, source_dir: Path, item: dict) -> dict | None:
-    """Generate description for a single item."""
+def describe_item(client, cpu_pool: Executor, source_dir: Path, item: dict) -> dict | None:
+    """Generate description for a single item.
+
+    Frame extraction is handed to cpu_pool (a process pool) so decoding scales
+    across cores; this thread only waits on it and on the Gemini call.
+    """
     local_path = source_dir / item["local_file"]
     if not local_path.exists():
         print(f"  File not found: {local_path}", file=sys.stderr)
         return None
 
     try:
-        frames = extract_frames(local_path, item.get("format", "gif"))
+        frames = cpu_pool.submit(extract_frames, local_path, item.get("format", "gif")).result()
     except Exception as e:
         print(f"  Frame extraction error for {item['id']}: {e}", file=sys.stderr)
         return None
 
     try:
-        parts = [types.Part.from_text(text=DESCRIPTION_PROMPT)]
-        for frame_png in frames:
-            parts.append(types.Part.from_bytes(data=frame_png, mime_type="image/png"))
+        parts = [PROMPT_PART]
+        for frame_data, mime_type in frames:
+            parts.append(types.Part.from_bytes(data=frame_data, mime_type=mime_type))
 
         response = client.models.generate_content(
             model=MODEL_NAME,
@@ -224,7 +298,7 @@ def describe_item(client, source_dir: Path, item: dict) -> dict | None:
             lines = text.split("\n")
             text = "\n".join(lines[1:-1])
 
-        desc = json.loads(text)
+        desc = orjson.loads(text)
 
         return {
             "id": item["id"],
@@ -233,7 +307,7 @@ def describe_item(client, source_dir: Path, item: dict) -> dict | None:
             "original_description": item.get("title", ""),
             **desc,
         }
-    except json.JSONDecodeError as e:
+    except orjson.JSONDecodeError as e:
         print(f"  JSON parse error for {item['id']}: {e}", file=sys.stderr)
         return None
     except Exception as e:
@@ -241,9 +315,12 @@ def describe_item(client, source_dir: Path, item: dict) -> dict | None:
         return None
 
 
-def process_source(client, source_dir: Path, manifest: dict,
+def process_source(client, cpu_pool: Executor, source_dir: Path, manifest: dict,
                    workers: int, limit: int, force: bool) -> int:
-    """Process all undescribed items for a source. Returns count processed."""
+    """Process all undescribed items for a source. Returns count processed.
+
+    Marks described items in `manifest` in place; the caller saves it.
+    """
     to_process = items_needing_description(manifest, force=force)
     if limit:
         to_process = to_process[:limit]
@@ -257,11 +334,11 @@ def process_source(client, source_dir: Path, manifest: dict,
     # Load existing descriptions for resume support
     existing_ids = set()
     if descriptions_path.exists() and not force:
-        with open(descriptions_path) as f:
+        with open(descriptions_path, "rb") as f:
             for line in f:
                 try:
-                    existing_ids.add(json.loads(line)["id"])
-                except (json.JSONDecodeError, KeyError):
+                    existing_ids.add(orjson.loads(line)["id"])
+                except (orjson.JSONDecodeError, KeyError):
                     pass
         to_process = [i for i in to_process if i["id"] not in existing_ids]
 
@@ -271,29 +348,38 @@ def process_source(client, source_dir: Path, manifest: dict,
 
     print(f"  {len(to_process)} items to describe with {workers} workers")
 
-    lock = threading.Lock()
     success = 0
     failed = 0
     start = time.time()
 
-    output_mode = "a" if existing_ids else "w"
+    output_mode = "ab" if existing_ids else "wb"
     if force:
-        output_mode = "w"
+        output_mode = "wb"
+
+    # Completions are drained on this thread only; the writer thread owns the file
+    writer_q = queue.Queue(maxsize=1024)
+    writer_errors = []
 
     with open(descriptions_path, output_mode) as out:
-        with ThreadPoolExecutor(max_workers=workers) as executor:
-            futures = {
-                executor.submit(describe_item, client, source_dir, item): item
-                for item in to_process
-            }
-
-            for future in as_completed(futures):
-                item = futures[future]
-                result = future.result()
-                with lock:
+        writer = threading.Thread(target=write_jsonl, args=(writer_q, out, writer_errors), daemon=True)
+        writer.start()
+        try:
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                futures = {
+                    executor.submit(describe_item, client, cpu_pool, source_dir, item): item
+                    for item in to_process
+                }
+
+                for future in as_completed(futures):
+                    item = futures[future]
+                    result = future.result()
+                    if writer_errors:
+                        # Output is broken; don't spend API calls on the rest
+                        for other in futures:
+                            other.cancel()
+                        break
                     if result:
-                        out.write(json.dumps(result) + "\n")
-                        out.flush()
+                        writer_q.put(result)
                         item["described"] = True
                         success += 1
                     else:
@@ -305,9 +391,12 @@ def process_source(client, source_dir: Path, manifest: dict,
                         rate = done / elapsed if elapsed > 0 else 0
                         print(f"  [{source_name}] {success} ok, {failed} fail, "
                               f"{done}/{len(to_process)} ({rate:.1f}/sec)")
-
-    # Save manifest with updated described status
-    save_manifest(source_dir, manifest)
+        finally:
+            writer_q.put(WRITER_STOP)
+            writer.join()
+    # Raising here keeps main() from saving described flags for records
+    # that never reached the file
+    check_writer(writer_errors)
 
     return success
 
@@ -316,9 +405,14 @@ def main():
     parser = argparse.ArgumentParser(description="Describe GIFs from source manifests")
     parser.add_argument("--source", help="Process only this source (directory name)")
     parser.add_argument("--limit", type=int, default=0, help="Limit items per source (0=all)")
-    parser.add_argument("--workers", type=int, default=10, help="Concurrent workers (default: 10)")
+    parser.add_argument("--workers", type=positive_int, default=10, help="Concurrent workers (default: 10)")
     parser.add_argument("--force", action="store_true", help="Re-describe all items")
+    parser.add_argument("--no-frame-cache", action="store_true",
+                        help="Don't read or write the on-disk frame cache (cache/frames/)")
     args = parser.parse_args()
+    if args.no_frame_cache:
+        # Set before any process pool starts so worker processes inherit it
+        os.environ[FRAME_CACHE_DISABLE_ENV] = "1"
 
     api_key = load_api_key()
     client = genai.Client(api_key=api_key)
@@ -331,17 +425,24 @@ def main():
     print(f"Found {len(sources)} source(s): {', '.join(s.name for s in sources)}")
 
     total_success = 0
-    for source_dir in sources:
-        manifest = load_manifest(source_dir)
-        source_name = manifest["source"]
-        total = len(manifest["items"])
-        downloaded = sum(1 for i in manifest["items"] if i.get("downloaded"))
-        described = sum(1 for i in manifest["items"] if i.get("described"))
-
-        print(f"\n=== {source_name} === ({total} items, {downloaded} downloaded, {described} described)")
-
-        count = process_source(client, source_dir, manifest, args.workers, args.limit, args.force)
-        total_success += count
+    # Frame extraction (CPU-bound) runs in worker processes shared by all sources
+    with ProcessPoolExecutor(max_workers=os.cpu_count()) as cpu_pool:
+        for source_dir in sources:
+            view = ManifestView(source_dir)
+            print(f"\n=== {view.source} === ({view.total} items, {view.downloaded_count} downloaded, "
+                  f"{view.described_count} described)")
+
+            # Nothing to do: skip without parsing an unchanged manifest
+            if not args.force and not view.pending_count:
+                continue
+
+            count = process_source(client, cpu_pool, source_dir, view.manifest,
+                                   args.workers, args.limit, args.force)
+            total_success += count
+
+            # Save manifest with updated described status, once per source
+            if count:
+                view.save()
 
     print(f"\nDone! Described {total_success} items total across {len(sources)} source(s)")
 
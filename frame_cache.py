@@ -0,0 +1,107 @@
+"""
+Disk + in-process memoization for frame extraction.
+
+Decoding a GIF/video and re-encoding its frames is the main CPU cost per item,
+and it is repeated on every rerun of describe_gifs.py / describe_sources.py.
+@disk_memoize stores the extracted frames under cache/frames/<ab>/<hash>.pkl
+and optionally keeps the most recently used results in memory, so reruns (and
+repeated items within a run) skip the decode entirely.
+
+Each entry holds one item's encoded frames, typically 100-300 KB, and nothing
+is evicted: delete the directory to reclaim space. describe_gifs.py only uses
+the cache with --frame-cache, since TGIF is large and every GIF is downloaded
+again anyway; describe_sources.py uses it unless given --no-frame-cache. Both
+work by setting FRAME_CACHE_DISABLE=1, which is read on every call so it
+reaches worker processes started after it is set.
+
+Usage:
+    @disk_memoize(key=lambda data, *a, **kw: hashlib.sha256(data).hexdigest())
+    def extract_frames(data: bytes, ...) -> list[tuple[bytes, str]]: ...
+"""
+
+import functools
+import hashlib
+import os
+import pickle
+import sys
+import tempfile
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Callable
+
+CACHE_DIR = Path(__file__).parent / "cache" / "frames"
+DISABLE_ENV = "FRAME_CACHE_DISABLE"
+
+
+def cache_disabled() -> bool:
+    return os.environ.get(DISABLE_ENV, "") not in ("", "0")
+
+
+def disk_memoize(key: Callable[..., str], version: int = 1,
+                 cache_dir: Path = CACHE_DIR, maxsize: int = 32):
+    """Memoize a function on disk and in memory, keyed by key(*args, **kwargs).
+
+    Bump `version` whenever the wrapped function's output format changes so
+    stale cache entries are ignored. `maxsize` bounds the in-memory LRU per
+    process; 0 disables it.
+    """
+    def decorator(fn):
+        memory: OrderedDict[str, object] = OrderedDict()
+        lock = threading.Lock()
+
+        def remember(digest: str, value) -> None:
+            if maxsize <= 0:
+                return
+            with lock:
+                memory[digest] = value
+                memory.move_to_end(digest)
+                if len(memory) > maxsize:
+                    memory.popitem(last=False)
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if cache_disabled():
+                return fn(*args, **kwargs)
+            raw_key = f"{fn.__qualname__}:v{version}:{key(*args, **kwargs)}"
+            digest = hashlib.sha256(raw_key.encode()).hexdigest()
+
+            with lock:
+                if digest in memory:
+                    memory.move_to_end(digest)
+                    return memory[digest]
+
+            path = cache_dir / digest[:2] / f"{digest}.pkl"
+            try:
+                value = pickle.loads(path.read_bytes())
+                remember(digest, value)
+                return value
+            except FileNotFoundError:
+                pass
+            except Exception as e:
+                print(f"  Ignoring unreadable cache entry {path}: {e}", file=sys.stderr)
+
+            value = fn(*args, **kwargs)
+
+            # Write to a temp file and rename so concurrent workers never see
+            # a half-written entry
+            tmp = None
+            try:
+                path.parent.mkdir(parents=True, exist_ok=True)
+                fd, tmp = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+                with os.fdopen(fd, "wb") as f:
+                    pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+                os.replace(tmp, path)
+            except OSError as e:
+                print(f"  Cache write error: {e}", file=sys.stderr)
+                # Don't leave partial temp files behind (e.g. on a full disk)
+                if tmp is not None:
+                    try:
+                        os.unlink(tmp)
+                    except OSError:
+                        pass
+            remember(digest, value)
+            return value
+
+        return wrapper
+    return decorator